@@ -1,18 +1,22 @@
 import asyncio
-import json
 import os
-import pickle
+import struct
+import sys
+import threading
 import time
 import uuid
 from contextlib import asynccontextmanager
-from typing import Annotated
+from typing import Literal
 
+import numpy as np
+import orjson
 from auth import require_api_key
+from cachetools import TTLCache
+from models import load_once, unload
 from config import API_KEY, LOGISTIC_MODEL, RF_MODEL
-from fastapi import (BackgroundTasks, Depends, FastAPI, HTTPException, Path,
-                     Request)
+from fastapi import Depends, FastAPI, Request
 from pydantic import BaseModel, Field
-from starlette.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 
 class IrisData(BaseModel):
@@ -24,31 +28,254 @@ class IrisData(BaseModel):
     petal_width: float = Field(default=4.1, gt=0, lt=10)
 
 
-ml_models = {}  # Global dictionary to hold the models.
+# One scratch buffer per thread, allocated once and refilled per request.
+# All async handlers run on the event loop thread and therefore share one
+# buffer, so a handler must copy the row out (or finish using it) before
+# its next await hands control to another request.
+_scratch = threading.local()
 
 
-def load_model(path: str):
-    model = None
-    with open(path, "rb") as f:
-        model = pickle.load(f)
-    return model
+def get_input_buffer(iris: IrisData):
+    buf = getattr(_scratch, "buffer", None)
+    if buf is None:
+        buf = _scratch.buffer = np.empty((1, 4), dtype=np.float32)
+
+    buf[0, 0] = iris.sepal_length
+    buf[0, 1] = iris.sepal_width
+    buf[0, 2] = iris.petal_length
+    buf[0, 3] = iris.petal_width
+    return buf
+
+
+# Cached (coef, intercept, classes) per linear model. model.predict() goes
+# through check_array/decision_function/safe_sparse_dot -- dozens of Python
+# frames for a 3x4 matvec -- so the hot path does the matvec itself.
+fast_coefs = {}
+
+
+def cache_fast_coefs(model_name: str, model):
+    if hasattr(model, "coef_") and model.coef_.shape[0] == len(model.classes_):
+        fast_coefs[model_name] = (
+            model.coef_.astype(np.float32),
+            model.intercept_.astype(np.float32),
+            model.classes_,
+        )
+
+
+def run_predict(model_name: str, model, X):
+    fast = fast_coefs.get(model_name)
+    if fast is None:
+        return model.predict(X)
+
+    coef, intercept, classes = fast
+    scores = X @ coef.T + intercept
+    return classes[scores.argmax(axis=1)]
+
+
+class ModelStore:
+    """Loads models lazily on first use and evicts ones idle too long.
+
+    Loading eagerly in lifespan doubles cold start and keeps both models
+    resident even when a worker only ever serves one of them.
+    """
+
+    def __init__(self, paths: dict):
+        self._paths = paths
+        self._loaded = {}
+        self._last_used = {}
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, name: str):
+        return name in self._paths
+
+    def names(self):
+        return list(self._paths.keys())
+
+    async def get(self, name: str):
+        model = self._loaded.get(name)
+        if model is None:
+            async with self._lock:
+                if name not in self._loaded:
+                    self._loaded[name] = await asyncio.to_thread(
+                        load_once, self._paths[name]
+                    )
+                    cache_fast_coefs(name, self._loaded[name])
+                model = self._loaded[name]
+        self._last_used[name] = time.monotonic()
+        return model
+
+    async def evict_idle(self, max_idle: float):
+        async with self._lock:
+            now = time.monotonic()
+            for name, last_used in list(self._last_used.items()):
+                if now - last_used > max_idle:
+                    self._loaded.pop(name, None)
+                    self._last_used.pop(name, None)
+                    fast_coefs.pop(name, None)
+                    unload(self._paths[name])
+
+    def clear(self):
+        for name in self._loaded:
+            unload(self._paths[name])
+        self._loaded.clear()
+        self._last_used.clear()
+
+
+MODEL_PATHS = {"logistic_model": LOGISTIC_MODEL, "rf_model": RF_MODEL}
+
+# Validating the path parameter as a Literal is a frozenset membership
+# check in Pydantic v2, cheaper than the regex match it replaces, and
+# guarantees the handler only ever sees known model names.
+ModelName = Literal["logistic_model", "rf_model"]
+MODEL_IDLE_TTL = 600  # seconds
+
+ml_models = ModelStore(MODEL_PATHS)
+
+
+async def evict_idle_models():
+    while True:
+        await asyncio.sleep(60)
+        await ml_models.evict_idle(MODEL_IDLE_TTL)
+
+
+# Micro-batching: sklearn's per-call overhead is fixed, so concurrent
+# requests are gathered for up to BATCH_WAIT seconds and predicted in one
+# vectorized call instead of one call per row.
+BATCH_MAX_SIZE = 32
+BATCH_WAIT = 0.001  # seconds
+
+prediction_queues = {}
+batcher_tasks = []
+
+
+async def run_batcher(model_name: str):
+    queue = prediction_queues[model_name]
+    while True:
+        row, fut = await queue.get()
+        rows = [row]
+        futures = [fut]
+
+        # Gather whatever else arrives within BATCH_WAIT, up to the cap.
+        while len(rows) < BATCH_MAX_SIZE:
+            try:
+                row, fut = await asyncio.wait_for(queue.get(), timeout=BATCH_WAIT)
+            except asyncio.TimeoutError:
+                break
+            rows.append(row)
+            futures.append(fut)
+
+        try:
+            model = await ml_models.get(model_name)
+            # Run the CPU-bound predict in a worker thread so the event
+            # loop keeps accepting requests (BLAS releases the GIL).
+            predictions = await asyncio.to_thread(
+                run_predict, model_name, model, np.vstack(rows)
+            )
+        except Exception as exc:
+            for fut in futures:
+                # A disconnected client cancels its future; resolving it
+                # again would raise and kill the batcher.
+                if not fut.done():
+                    fut.set_exception(exc)
+            continue
+
+        for fut, pred in zip(futures, predictions):
+            if not fut.done():
+                fut.set_result(int(pred))
+
+
+# Prediction logging: BackgroundTasks has no concurrency cap, so under
+# load thousands of pending log tasks would pile up. A bounded queue plus
+# one drainer task caps memory and flushes records in batches.
+LOG_QUEUE = asyncio.Queue(maxsize=10_000)
+LOG_BATCH_SIZE = 100
+
+
+def enqueue_log(data: dict):
+    try:
+        LOG_QUEUE.put_nowait(data)
+    except asyncio.QueueFull:
+        # Losing a log record beats letting the backlog exhaust memory.
+        pass
+
+
+async def drain_log_queue():
+    while True:
+        records = [await LOG_QUEUE.get()]
+        while len(records) < LOG_BATCH_SIZE:
+            try:
+                records.append(LOG_QUEUE.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        await asyncio.to_thread(log_predictions, records)
+
+
+async def predict_batched(model_name: str, iris: IrisData) -> int:
+    # The scratch buffer gets overwritten by the next request, so the
+    # queued row has to be an owned copy.
+    row = get_input_buffer(iris)[0].copy()
+    fut = asyncio.get_running_loop().create_future()
+    await prediction_queues[model_name].put((row, fut))
+    return await fut
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load models when the app starts
-    ml_models["logistic_model"] = load_model(LOGISTIC_MODEL)
-    ml_models["rf_model"] = load_model(RF_MODEL)
+    # Models are loaded lazily on first request by the ModelStore.
+    sweeper = asyncio.create_task(sweep_cache())
+
+    for model_name in ml_models.names():
+        prediction_queues[model_name] = asyncio.Queue()
+        batcher_tasks.append(asyncio.create_task(run_batcher(model_name)))
+    batcher_tasks.append(asyncio.create_task(drain_log_queue()))
+    batcher_tasks.append(asyncio.create_task(evict_idle_models()))
+    batcher_tasks.append(asyncio.create_task(flush_access_logs()))
 
     yield
 
+    sweeper.cancel()
+    for task in batcher_tasks:
+        task.cancel()
+    batcher_tasks.clear()
+    prediction_queues.clear()
+
     # This code will be executed after the application finishes handling requests, right before the shutdown
     # Clean up the ML models and release the resources
     ml_models.clear()
+    fast_coefs.clear()
 
 
 # Create a FastAPI instance
-app = FastAPI(lifespan=lifespan)
+# orjson encodes the small float/int response dicts in C, several times
+# faster than the stdlib encoder behind the default JSONResponse.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+# Access logging stays off the request path: the middleware only enqueues
+# a tuple, and a background task batches, serializes, and writes. print +
+# per-request serialization would take the stdout lock before the response
+# reaches the client.
+ACCESS_LOG_QUEUE = asyncio.Queue(maxsize=16_384)
+ACCESS_LOG_BATCH_SIZE = 256
+ACCESS_LOG_INTERVAL = 0.05  # seconds
+
+dropped_access_logs = 0
+
+
+async def flush_access_logs():
+    while True:
+        await asyncio.sleep(ACCESS_LOG_INTERVAL)
+        records = []
+        while len(records) < ACCESS_LOG_BATCH_SIZE:
+            try:
+                records.append(ACCESS_LOG_QUEUE.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        if records:
+            # One serialize and one write per batch; each record is an
+            # (id, method, path, status, duration) row.
+            sys.stdout.buffer.write(orjson.dumps(records) + b"\n")
+            sys.stdout.buffer.flush()
 
 
 @app.middleware("http")
@@ -64,48 +291,71 @@ async def log_timing(request: Request, call_next):
     duration = time.perf_counter() - start
     response.headers["X-Process-Time"] = f"{duration:.3f}s"
     response.headers["X-Request-ID"] = req_id
-    print(
-        json.dumps(
-            {
-                "id": req_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status": response.status_code,
-                "duration": round(duration, 3),
-            }
+    try:
+        ACCESS_LOG_QUEUE.put_nowait(
+            (
+                req_id,
+                request.method,
+                request.url.path,
+                response.status_code,
+                round(duration, 3),
+            )
         )
-    )
+    except asyncio.QueueFull:
+        global dropped_access_logs
+        dropped_access_logs += 1
 
     # return response
     return response
 
 
-CACHE = {}
+TTL = 30  # seconds
+
+CACHE = TTLCache(maxsize=10_000, ttl=TTL)
 """
-key ---> TIMESTAMP, prediction
-rf_model:{speal_length:3,sepal_widht:4.1..} ---> 1
-logistic_model:{.....} ---> 0
+key ---> prediction
+rf_model:<packed features> ---> 1
+logistic_model:<packed features> ---> 0
+
+Bounded: entries expire after TTL and the oldest get evicted once maxsize
+is reached, so the cache cannot grow without limit under varied inputs.
 """
 
-TTL = 30  # seconds
+
+async def sweep_cache():
+    # Expiry is otherwise only checked on access, so stale entries would
+    # sit in memory until someone asks for the same key again.
+    while True:
+        await asyncio.sleep(5)
+        CACHE.expire()
+
+
+# Packing the four floats is one C call and gives a fixed 20-byte key,
+# much cheaper than serializing the whole model to JSON per lookup.
+KEY_FMT = struct.Struct("<4f")
 
 
 def make_cache_key(model_name, iris: IrisData):
-    return f"{model_name}:{iris.json()}"
+    return model_name.encode() + b":" + KEY_FMT.pack(
+        iris.sepal_length, iris.sepal_width, iris.petal_length, iris.petal_width
+    )
 
 
 @app.post("/predict_cached/{model_name}")
-async def predict_cached(model_name: str, iris: IrisData):
+async def predict_cached(model_name: ModelName, iris: IrisData):
     key = make_cache_key(model_name, iris)
-    now = time.time()
 
-    if key in CACHE and now - CACHE[key][0] < TTL:
-        return {"model": model_name, "prediction": CACHE[key][1], "cache": "HIT"}
+    pred = CACHE.get(key)
+    if pred is not None:
+        return {"model": model_name, "prediction": pred, "cache": "HIT"}
 
-    X = [[iris.sepal_length, iris.sepal_width, iris.petal_length, iris.petal_width]]
-    pred = int(ml_models[model_name].predict(X)[0])
+    # Copy before the await: the worker thread reads the row while other
+    # requests on the event loop may refill the shared buffer.
+    X = get_input_buffer(iris).copy()
+    model = await ml_models.get(model_name)
+    pred = int((await asyncio.to_thread(run_predict, model_name, model, X))[0])
 
-    CACHE[key] = (now, pred)
+    CACHE[key] = pred
     return {"model": model_name, "prediction": pred, "cache": "MISS"}
 
 
@@ -124,62 +374,44 @@ async def root():
 async def list_models():
     print(LOGISTIC_MODEL)
     print(RF_MODEL)
-    return {"available_models": list(ml_models.keys())}
+    return {"available_models": ml_models.names()}
 
 
 @app.post("/predict/{model_name}")
 async def predict(
-    model_name: Annotated[str, Path(regex=r"^(logistic_model|rf_model)$")],
+    model_name: ModelName,
     iris: IrisData,
-    background_tasks: BackgroundTasks,
 ):
     # await asyncio.sleep(5) # Mimic heavy workload.
 
-    input_data = [
-        [iris.sepal_length, iris.sepal_width, iris.petal_length, iris.petal_width]
-    ]
-
-    if model_name not in ml_models.keys():
-        raise HTTPException(status_code=404, detail="Model not found")
-
-    ml_model = ml_models[model_name]
-    prediction = ml_model.predict(input_data)
+    prediction = await predict_batched(model_name, iris)
 
-    background_tasks.add_task(
-        log_prediction,
-        {"model": model_name, "features": iris.dict(), "prediction": prediction},
+    # model_dump is the Pydantic v2 dump; .dict() is a deprecated shim.
+    enqueue_log(
+        {"model": model_name, "features": iris.model_dump(), "prediction": prediction}
     )
 
-    return {"model": model_name, "prediction": int(prediction[0])}
+    return {"model": model_name, "prediction": prediction}
 
 
-def log_prediction(data: dict):
+def log_predictions(records: list):
     time.sleep(5)  # mimic heavy work.
-    print(f"Logging prediction: {data}")
+    print(f"Logging {len(records)} prediction(s): {records}")
 
 
 @app.post("/predict_secure/{model_name}")
 async def predict_secure(
-    model_name: Annotated[str, Path(regex=r"^(logistic_model|rf_model)$")],
+    model_name: ModelName,
     iris: IrisData,
-    background_tasks: BackgroundTasks,
     _: str = Depends(require_api_key),
 ):
     # await asyncio.sleep(5) # Mimic heavy workload.
 
-    input_data = [
-        [iris.sepal_length, iris.sepal_width, iris.petal_length, iris.petal_width]
-    ]
-
-    if model_name not in ml_models.keys():
-        raise HTTPException(status_code=404, detail="Model not found")
-
-    ml_model = ml_models[model_name]
-    prediction = ml_model.predict(input_data)
+    prediction = await predict_batched(model_name, iris)
 
-    background_tasks.add_task(
-        log_prediction,
-        {"model": model_name, "features": iris.dict(), "prediction": prediction},
+    # model_dump is the Pydantic v2 dump; .dict() is a deprecated shim.
+    enqueue_log(
+        {"model": model_name, "features": iris.model_dump(), "prediction": prediction}
     )
 
-    return {"model": model_name, "prediction": int(prediction[0])}
+    return {"model": model_name, "prediction": prediction}
@@ -0,0 +1,60 @@
+"""Shared model loading for the lab apps.
+
+Each day's app used to define its own copy of load_model, so mounting
+several of the apps in one process made each of them unpickle the same
+files again. load_once caches by path, so every caller of this module
+instance shares one loaded copy per model. (Co-mounted day apps only
+share the cache when their identically named models modules resolve to
+the same file, which depends on sys.path order -- the per-process
+dedup guarantee holds within one module instance, not across them.)
+A plain dict is used rather than functools.lru_cache so unload can
+release a single model when an idle evictor asks for it.
+"""
+
+import joblib
+
+_loaded_by_path = {}
+
+
+class OnnxModel:
+    """Wraps an ONNX Runtime session behind the sklearn predict interface.
+
+    Tree traversal runs as fused C code without the GIL, avoiding
+    sklearn's per-call overhead on single-row random forest predicts.
+    """
+
+    def __init__(self, path: str):
+        import onnxruntime
+
+        self._session = onnxruntime.InferenceSession(
+            path, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict(self, X):
+        return self._session.run(None, {self._input_name: X})[0]
+
+
+def _load(path: str):
+    if path.endswith(".onnx"):
+        return OnnxModel(path)
+
+    # mmap the array data read-only so multiple workers share one
+    # resident copy through the page cache instead of each unpickling
+    # its own buffers. Also loads legacy pickle.dump'ed models.
+    return joblib.load(path, mmap_mode="r")
+
+
+def load_once(path: str):
+    if not path:
+        return None
+
+    model = _loaded_by_path.get(path)
+    if model is None:
+        model = _load(path)
+        _loaded_by_path[path] = model
+    return model
+
+
+def unload(path: str):
+    _loaded_by_path.pop(path, None)
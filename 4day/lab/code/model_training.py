@@ -2,7 +2,7 @@ from sklearn.datasets import load_iris
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 
-import pickle
+import joblib
 
 # Load the Iris dataset
 iris = load_iris()
@@ -16,10 +16,20 @@ logreg_model.fit(X, y)
 rf_model = RandomForestClassifier()
 rf_model.fit(X, y)
 
-# TODO: Save logistic regression model to disk.
-with open("models/logistic_regression.pkl", "wb") as f:
-    pickle.dump(logreg_model, f)
+# Save the models with joblib so the app can mmap the array data at load time.
+joblib.dump(logreg_model, "models/logistic_regression.pkl")
+joblib.dump(rf_model, "models/random_forest.pkl")
 
-# TODO: Save random forest model to disk.
-with open("models/random_forest.pkl", "wb") as f:
-    pickle.dump(rf_model, f)
\ No newline at end of file
+# Also export the random forest to ONNX: point RF_MODEL at the .onnx file
+# and the app serves it through ONNX Runtime instead of sklearn.
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    pass
+else:
+    onx = convert_sklearn(
+        rf_model, initial_types=[("X", FloatTensorType([None, 4]))]
+    )
+    with open("models/random_forest.onnx", "wb") as f:
+        f.write(onx.SerializeToString())
\ No newline at end of file
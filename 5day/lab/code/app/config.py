@@ -1,3 +1,4 @@
+import functools
 import os
 from pathlib import Path
 
@@ -6,6 +7,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+@functools.lru_cache(maxsize=None)
 def load_secret(name: str, default=None):
     # allow local dev via dotenv/env
     val = os.getenv(name)
@@ -14,10 +16,7 @@ def load_secret(name: str, default=None):
     # prod: mounted file at /run/secrets/<lowercased name>
     p = Path(f"/run/secrets/{name.lower()}")
     if p.exists():
-        print(p.read_text().strip())
         return p.read_text().strip()
-    print("nista")
-    print(name.lower())
     return default
 
 
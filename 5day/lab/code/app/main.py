@@ -1,5 +1,4 @@
 import asyncio
-import pickle
 import time
 from contextlib import asynccontextmanager
 from typing import Annotated
@@ -7,6 +6,7 @@ from typing import Annotated
 from auth import require_api_key
 from config import LOGISTIC_MODEL, RF_MODEL
 from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Path
+from models import load_once
 from pydantic import BaseModel, Field
 
 
@@ -22,18 +22,12 @@ class IrisData(BaseModel):
 ml_models = {}  # Global dictionary to hold the models.
 
 
-def load_model(path: str):
-    model = None
-    with open(path, "rb") as f:
-        model = pickle.load(f)
-    return model
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load models when the app starts
-    ml_models["logistic_model"] = load_model(LOGISTIC_MODEL)
-    ml_models["rf_model"] = load_model(RF_MODEL)
+    # Load models when the app starts; load_once shares already-loaded
+    # models with any other app module in the process.
+    ml_models["logistic_model"] = load_once(LOGISTIC_MODEL)
+    ml_models["rf_model"] = load_once(RF_MODEL)
 
     yield
 
@@ -1,8 +1,8 @@
 import os
-import pickle
 from contextlib import asynccontextmanager
 from typing import Annotated
 
+import joblib
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Path
 from pydantic import BaseModel, Field
@@ -25,10 +25,9 @@ def load_model(path: str):
     if not path:
         return None
 
-    model = None
-    with open(path, "rb") as f:
-        model = pickle.load(f)
-    return model
+    # The training scripts save with joblib now; joblib.load reads those
+    # as well as legacy pickle.dump'ed models.
+    return joblib.load(path, mmap_mode="r")
 
 
 @asynccontextmanager
@@ -1,14 +1,17 @@
+import asyncio
 import os
-import pickle
+import threading
 from contextlib import asynccontextmanager
-from typing import Annotated
+from typing import Literal
 
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from evidently import Report
 from evidently.presets import DataDriftPreset
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Path
-from fastapi.responses import FileResponse
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.responses import FileResponse, ORJSONResponse
+from models import load_once
 from pydantic import BaseModel, Field
 from sklearn.datasets import load_iris
 
@@ -26,29 +29,64 @@ class IrisData(BaseModel):
     petal_width: float = Field(default=4.1, gt=0, lt=10)
 
 
-def load_model(path: str):
-    if not path:
-        return None
+# One scratch buffer per thread, allocated once and refilled per request.
+# All async handlers run on the event loop thread and therefore share one
+# buffer, so a handler must copy the row out (or finish using it) before
+# its next await hands control to another request.
+_scratch = threading.local()
 
-    model = None
-    with open(path, "rb") as f:
-        model = pickle.load(f)
+
+def get_input_buffer(iris_data: IrisData):
+    buf = getattr(_scratch, "buffer", None)
+    if buf is None:
+        buf = _scratch.buffer = np.empty((1, 4), dtype=np.float32)
+
+    buf[0, 0] = iris_data.sepal_length
+    buf[0, 1] = iris_data.sepal_width
+    buf[0, 2] = iris_data.petal_length
+    buf[0, 3] = iris_data.petal_width
+    return buf
+
+
+MODEL_PATHS = {
+    "logistic_model": os.getenv("LOGISTIC_MODEL"),
+    "rf_model": os.getenv("RF_MODEL"),
+}
+
+# Validating the path parameter as a Literal is a frozenset membership
+# check in Pydantic v2, cheaper than the regex match it replaces, and
+# guarantees the handler only ever sees known model names.
+ModelName = Literal["logistic_model", "rf_model"]
+
+_model_lock = asyncio.Lock()
+
+
+async def get_model(name: str):
+    # Load lazily on first use so startup stays fast and a worker only
+    # pays for the models it actually serves.
+    model = ml_models.get(name)
+    if model is None:
+        async with _model_lock:
+            if name not in ml_models:
+                ml_models[name] = await asyncio.to_thread(
+                    load_once, MODEL_PATHS[name]
+                )
+            model = ml_models[name]
     return model
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load the ML model
-    ml_models["logistic_model"] = load_model(os.getenv("LOGISTIC_MODEL"))
-    ml_models["rf_model"] = load_model(os.getenv("RF_MODEL"))
-
+    # Models are loaded lazily by get_model on first request.
     yield
     # Clean up the ML models and release the resources
     ml_models.clear()
 
 
 # Create a FastAPI instance
-app = FastAPI(lifespan=lifespan)
+# orjson encodes the small float/int response dicts in C, several times
+# faster than the stdlib encoder behind the default JSONResponse.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 @app.get("/")
@@ -64,45 +102,43 @@ async def health_check():
 
 @app.get("/models")
 async def list_models():
-    return {"available_models": list(ml_models.keys())}
+    return {"available_models": list(MODEL_PATHS.keys())}
 
 
 @app.post("/predict/{model_name}")
 async def predict(
-    model_name: Annotated[str, Path(pattern=r"^(logistic_model|rf_model)$")],
+    model_name: ModelName,
     iris_data: IrisData,
     background_tasks: BackgroundTasks,
 ):
-    input_data = [
-        [
-            iris_data.sepal_length,
-            iris_data.sepal_width,
-            iris_data.petal_length,
-            iris_data.petal_width,
-        ]
-    ]
-
-    if model_name not in ml_models.keys():
-        raise HTTPException(status_code=404, detail="Model not found.")
-
-    model = ml_models[model_name]
+    # Fetch the model before touching the shared buffer: the await may
+    # run other requests, which would refill it.
+    model = await get_model(model_name)
+
+    input_data = get_input_buffer(iris_data)
     prediction = model.predict(input_data)
 
-    background_tasks.add_task(log_data, input_data[0], int(prediction[0]))
+    # The buffer is reused, so hand the logger its own copy of the row.
+    background_tasks.add_task(log_data, input_data[0].copy(), int(prediction[0]))
 
     return {"model": model_name, "prediction": int(prediction[0])}
 
 
 ### PART 3 solution
-# Global variable for storing logs
-DATA_LOG = []
+# Fixed-size ring buffer holding the last DATA_WINDOW_SIZE rows: one
+# contiguous float32 block instead of an ever-growing list of Python
+# lists, so logging never allocates and memory stays O(window).
 DATA_WINDOW_SIZE = 45
+DATA_LOG = np.empty((DATA_WINDOW_SIZE, 5), dtype=np.float32)
+_log_count = 0
 
 
-def log_data(iris_data: list, prediction: int):
-    global DATA_LOG
-    iris_data.append(prediction)
-    DATA_LOG.append(iris_data)
+def log_data(iris_row, prediction: int):
+    global _log_count
+    slot = _log_count % DATA_WINDOW_SIZE
+    DATA_LOG[slot, :4] = iris_row
+    DATA_LOG[slot, 4] = prediction
+    _log_count += 1
 
 
 def load_train_data():
@@ -112,34 +148,41 @@ def load_train_data():
     return df
 
 
+# The reference data and the report definition never change between
+# /monitoring calls, so build them once; only the current window varies.
+REFERENCE_DATA = load_train_data()
+
+DRIFT_REPORT = Report(
+    metrics=[
+        DataDriftPreset(),
+    ],
+    include_tests=True,
+)
+
+PREDICTION_COLUMNS = [
+    "sepal length (cm)",
+    "sepal width (cm)",
+    "petal length (cm)",
+    "petal width (cm)",
+    "species",
+]
+
+
 # loads our latest predictions
 def load_last_predictions():
-    prediction_data = pd.DataFrame(
-        DATA_LOG[-DATA_WINDOW_SIZE:],
-        columns=[
-            "sepal length (cm)",
-            "sepal width (cm)",
-            "petal length (cm)",
-            "petal width (cm)",
-            "species",
-        ],
-    )
-    return prediction_data
+    if _log_count <= DATA_WINDOW_SIZE:
+        window = DATA_LOG[:_log_count]
+    else:
+        # Rotate so the rows come out oldest-first after wraparound.
+        window = np.roll(DATA_LOG, -(_log_count % DATA_WINDOW_SIZE), axis=0)
+    return pd.DataFrame(window, columns=PREDICTION_COLUMNS)
 
 
 def generate_dashboard() -> str:
-    data_report = Report(
-        metrics=[
-            DataDriftPreset(),
-        ],
-        include_tests="True",
-    )
-
-    reference_data = load_train_data()
     current_data = load_last_predictions()
 
-    generated_report = data_report.run(
-        reference_data=reference_data, current_data=current_data
+    generated_report = DRIFT_REPORT.run(
+        reference_data=REFERENCE_DATA, current_data=current_data
     )
 
     return generated_report.save_html("report.html")
@@ -147,7 +190,7 @@ def generate_dashboard() -> str:
 
 @app.get("/monitoring", tags=["Other"])
 def monitoring():
-    if len(DATA_LOG) == 0:
+    if _log_count == 0:
         return {"msg": "No data."}
     generate_dashboard()
     return FileResponse(